@@ -1,20 +1,138 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import pandas as pd
+from celery import Celery
+from celery.result import AsyncResult
+from celery.signals import worker_process_init
+import polars as pl
+import polars.selectors as cs
 import numpy as np
+import orjson
+import contextlib
+import cProfile
 import os
+import platform
+import pstats
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import joblib
 from datetime import datetime
 import json
 
+# Route scikit-learn estimators through Intel's oneDAL kernels when scikit-learn-intelex is
+# installed. This must run before anything imports sklearn; USE_SKLEARNEX=0 turns it off
+SKLEARNEX_PATCHED = False
+if os.environ.get('USE_SKLEARNEX', '1') == '1':
+    try:
+        from sklearnex import patch_sklearn
+        patch_sklearn()
+        SKLEARNEX_PATCHED = True
+    except ImportError:
+        pass
+
+from random_forest_gemm import ForestGEMM
+import random_forest_numba
+from random_forest_numba import ForestKernel
+import uring_io
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+def _json_default(obj):
+    """Fallback for arrays orjson cannot serialize natively (e.g. strings)"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_json(payload):
+    """Serialize a response payload with orjson, encoding NumPy arrays directly"""
+    return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, so jsonify encodes NumPy arrays directly"""
+    
+    def dumps(self, obj, **kwargs):
+        return dumps_json(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app.json = ORJSONProvider(app)
+
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 MODEL_FOLDER = 'trained_model'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(MODEL_FOLDER, exist_ok=True)
 
+# Task queue configuration - predictions run on Celery workers, not on the request thread
+app.config.update(
+    CELERY_BROKER_URL=os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
+    CELERY_RESULT_BACKEND=os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/1'),
+)
+CSV_CHUNK_SIZE = 50_000  # rows parsed and predicted per step
+KEEP_UPLOADS = os.environ.get('KEEP_UPLOADS', '0') == '1'  # keep uploaded CSVs for auditing
+STREAM_MEMORY_LIMIT = 1 << 20  # /api/predict/stream parses uploads up to this size from memory
+
+# Profiling of the prediction pipeline (/api/_profile) - development only
+ENABLE_PROFILING = os.environ.get('ENABLE_PROFILING', '0') == '1'
+PROFILE_FOLDER = os.path.join(MODEL_FOLDER, 'profiles')
+PROFILE_MAX_ROWS = 1_000_000  # bounds the canned CSV, which is cached per size
+
+# Forest inference as sparse matrix products - opt-in, it only pays off where BLAS beats tree traversal
+USE_FOREST_GEMM = os.environ.get('USE_FOREST_GEMM', '0') == '1'
+GEMM_MIN_BATCH = 10_000  # smaller batches are traversed tree by tree
+DEDUP_MAX_UNIQUE_RATIO = 0.8  # predict on distinct rows only when fewer than this share are distinct
+DEDUP_MIN_ROWS = 5_000  # smaller batches are predicted as they are
+DEDUP_SAMPLE_ROWS = 2_000  # rows sampled to estimate the distinct share before the full dedup
+
+# Micro-batching of small JSON prediction requests
+BATCH_MAX_ROWS = 1024  # flush once this many rows are waiting
+BATCH_MAX_WAIT = 0.005  # seconds the first request in a batch waits for others
+BATCH_RESULT_TIMEOUT = 1.0  # seconds a request waits for its predictions
+
+CLASSIFICATION_QUEUE = 'classification'  # CPU-heavy model inference
+ADMIN_QUEUE = 'admin'  # lightweight model management tasks
+
+def make_celery(app):
+    """Create a Celery app whose tasks run inside the Flask app context"""
+    celery = Celery(
+        app.import_name,
+        broker=app.config['CELERY_BROKER_URL'],
+        backend=app.config['CELERY_RESULT_BACKEND']
+    )
+
+    class ContextTask(celery.Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery.Task = ContextTask
+    return celery
+
+QUEUE_RETRY_POLICY = {'max_retries': 2, 'interval_start': 0, 'interval_step': 0.5, 'interval_max': 1}
+
+celery = make_celery(app)
+celery.conf.update(
+    task_routes={
+        'app.run_prediction': {'queue': CLASSIFICATION_QUEUE},
+        'app.admin_*': {'queue': ADMIN_QUEUE},
+    },
+    task_default_queue=ADMIN_QUEUE,
+    # Tasks and results are JSON only, so nothing read back from the broker can run code;
+    # run_prediction serializes its NumPy results itself (see dumps_json)
+    task_serializer='json',
+    result_serializer='json',
+    accept_content=['json'],
+    # Fail fast when Redis is down instead of holding a request thread for ~20 s of retries
+    broker_connection_timeout=2,
+    task_publish_retry_policy=QUEUE_RETRY_POLICY,
+    redis_socket_connect_timeout=2,
+    result_backend_transport_options={'retry_policy': QUEUE_RETRY_POLICY},
+)
+
 # Global variables for model and metadata
 model_metadata = {
     "model_type": "Not loaded",
@@ -25,33 +143,88 @@ model_metadata = {
 }
 
 class MLModel:
-    """Mock ML Model class - to be replaced with actual model"""
+    """ML Model class - serves the trained model, or a mock one until it is ready"""
+    
+    MOCK_CLASSES = np.array(['Class A', 'Class B', 'Class C'])
     
     def __init__(self):
         self.is_trained = False
         self.model = None
+        self.predictor = None  # compiled tree predictor, when one could be built
+        self.gemm = None  # matrix form of the forest for large batches
+        self.kernel = None  # numba-compiled forest traversal
+        self.model_path = None  # file the model was loaded from (the cache file for the mock)
+        self._dedup_rng = np.random.default_rng()  # picks the rows sampled before deduplicating
     
     def load_model(self, model_path):
         """Load a trained model from file"""
         try:
-            # This will be implemented when the actual model is ready
-            # For now, we'll create a mock model
-            self.model = self.create_mock_model()
+            if model_path == "mock":
+                self.model = self.create_mock_model()
+            else:
+                self.model = joblib.load(model_path, mmap_mode='r')
+                self.predictor = self.compile_model(model_path)
+                self.model_path = model_path
+            # Models fitted under sklearnex already predict with oneDAL's SIMD kernels
+            uses_onedal = type(self.model).__module__.startswith('sklearnex')
+            if not uses_onedal and ForestKernel.supports(self.model) and ForestKernel.is_worthwhile():
+                self.kernel = ForestKernel(self.model)
+            if USE_FOREST_GEMM and ForestGEMM.supports(self.model):
+                self.gemm = ForestGEMM(self.model)
             self.is_trained = True
             return True
         except Exception as e:
             print(f"Error loading model: {e}")
             return False
     
+    def compile_model(self, model_path):
+        """Compile a tree ensemble to a native predictor with compiledtrees, if possible"""
+        if platform.system() == 'Windows':  # compiledtrees does not support Windows
+            return None
+        
+        try:
+            import compiledtrees
+        except ImportError:
+            return None
+        
+        # Only regression trees/ensembles can be compiled
+        if not compiledtrees.CompiledRegressionPredictor.compilable(self.model):
+            return None
+        
+        # Reuse the compiled shared object across restarts while model.pkl is unchanged
+        compiled_path = os.path.splitext(model_path)[0] + '_compiled.pkl'
+        try:
+            if os.path.getmtime(compiled_path) >= os.path.getmtime(model_path):
+                return joblib.load(compiled_path)
+        except Exception:
+            pass
+        
+        predictor = compiledtrees.CompiledRegressionPredictor(self.model)
+        joblib.dump(predictor, compiled_path)
+        return predictor
+    
     def create_mock_model(self):
-        """Create a mock model for testing"""
+        """Create a mock model for testing, reusing the one fitted on a previous start"""
         from sklearn.ensemble import RandomForestClassifier
         from sklearn.datasets import make_classification
         
+        # Stored uncompressed so the tree arrays can be memory-mapped on load; sklearnex
+        # forests are cached separately so USE_SKLEARNEX=0 really gets a stock forest
+        mock_name = 'mock_rf_sklearnex.joblib' if SKLEARNEX_PATCHED else 'mock_rf.joblib'
+        mock_path = os.path.join(MODEL_FOLDER, mock_name)
+        self.model_path = mock_path
+        if os.path.exists(mock_path):
+            try:
+                return joblib.load(mock_path, mmap_mode='r')
+            except Exception as e:
+                print(f"Error loading cached mock model, refitting: {e}")
+        
         # Create a simple mock model
-        X, y = make_classification(n_samples=100, n_features=4, random_state=42)
+        X, y = make_classification(n_samples=100, n_features=4, n_informative=3,
+                                   n_redundant=1, n_classes=3, random_state=42)
         model = RandomForestClassifier(n_estimators=10, random_state=42)
-        model.fit(X, y)
+        model.fit(X, self.MOCK_CLASSES[y])
+        joblib.dump(model, mock_path)
         return model
     
     def predict(self, data):
@@ -60,33 +233,173 @@ class MLModel:
             return None, None
         
         try:
-            if hasattr(data, 'shape'):
-                n_samples = data.shape[0]
-            else:
-                n_samples = len(data)
-                
-            predictions = np.random.choice(['Class A', 'Class B', 'Class C'], n_samples)
-            confidence = np.random.uniform(0.7, 0.95, n_samples)
+            X = np.asarray(data, dtype=np.float32)
+            
+            # Identical rows get identical predictions, so only run the model on distinct rows
+            # when that saves enough work to pay for finding them. The full sort costs about as
+            # much as predicting, so it only runs when a small random sample already shows
+            # duplicates. Rows are compared as raw bytes, which is several times faster than
+            # np.unique(X, axis=0)
+            X = np.ascontiguousarray(X)
+            if len(X) < DEDUP_MIN_ROWS:
+                return self._raw_predict(X)
+            
+            sample = self._dedup_rng.choice(len(X), DEDUP_SAMPLE_ROWS, replace=False)
+            if len(np.unique(_row_bytes(X[sample]))) >= DEDUP_MAX_UNIQUE_RATIO * DEDUP_SAMPLE_ROWS:
+                return self._raw_predict(X)
+            
+            unique, first, inverse = np.unique(_row_bytes(X), return_index=True, return_inverse=True)
+            if len(unique) >= DEDUP_MAX_UNIQUE_RATIO * len(X):
+                return self._raw_predict(X)
             
-            return predictions, confidence
+            predictions, confidence = self._raw_predict(X[first])
+            return predictions[inverse], confidence[inverse] if confidence is not None else None
         except Exception as e:
             print(f"Prediction error: {e}")
             return None, None
+    
+    def _raw_predict(self, X):
+        """Run the model; confidence is the winning class probability (None for regressors)"""
+        if self.gemm is not None and len(X) >= GEMM_MIN_BATCH:
+            return self._from_scores(self.gemm.predict_scores(X))
+        
+        if self.predictor is not None:
+            return self.predictor.predict(X), None
+        
+        if self.kernel is not None:
+            return self._from_scores(self.kernel.predict_scores(X))
+        
+        if hasattr(self.model, 'predict_proba'):
+            return self._from_scores(self.model.predict_proba(X))
+        
+        return self.model.predict(X), None
+    
+    def _from_scores(self, scores):
+        """Turn class probabilities or single-output regression scores into (predictions, confidence)"""
+        if not hasattr(self.model, 'classes_'):
+            return scores[:, 0], None
+        
+        best = scores.argmax(axis=1)
+        return self.model.classes_[best], scores[np.arange(len(best)), best]
+
+def _row_bytes(X):
+    """View each row of a C-contiguous 2-D array as one opaque value, so rows compare as bytes"""
+    return np.ascontiguousarray(X).view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).reshape(-1)
+
+class PredictionBatcher:
+    """Coalesces concurrent small prediction requests into a single model call"""
+    
+    def __init__(self, model, max_rows=BATCH_MAX_ROWS, max_wait=BATCH_MAX_WAIT):
+        self.model = model
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def submit(self, rows):
+        """Queue a 2-D array of rows; returns a Future of (predictions, confidence)"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((rows, future))
+        return future
+    
+    def _ensure_started(self):
+        # Started on first use so the thread lives in the serving process, not in a parent that forks
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            n_rows = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while n_rows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                n_rows += len(batch[-1][0])
+            self._flush(batch)
+    
+    def _flush(self, batch):
+        """Predict all queued rows at once and hand each request its slice"""
+        result = self._predict(np.vstack([rows for rows, _ in batch]))
+        
+        # If the combined call failed, retry each request alone so one bad request
+        # does not fail the others it was batched with
+        if result is None and len(batch) > 1:
+            for rows, future in batch:
+                self._resolve(future, self._predict(rows))
+            return
+        
+        start = 0
+        for rows, future in batch:
+            stop = start + len(rows)
+            self._resolve(future, result and (
+                result[0][start:stop],
+                result[1][start:stop] if result[1] is not None else None
+            ))
+            start = stop
+    
+    def _predict(self, rows):
+        """(predictions, confidence) for the rows, or None if the model call failed"""
+        try:
+            predictions, confidence = self.model.predict(rows)
+        except Exception as e:
+            print(f"Batched prediction error: {e}")
+            return None
+        return None if predictions is None else (predictions, confidence)
+    
+    @staticmethod
+    def _resolve(future, result):
+        if result is None:
+            future.set_exception(PredictionError("Model prediction failed", 500))
+        else:
+            future.set_result(result)
 
 # Initialize the model
 ml_model = MLModel()
+batcher = PredictionBatcher(ml_model)
+
+_metadata_mtime = None  # mtime of the metadata file model_metadata was last loaded from
+_feature_dtypes = {}  # CSV parse schema for the model's feature columns, rebuilt with the metadata
 
 def load_model_metadata():
     """Load model metadata from file"""
-    global model_metadata
+    global model_metadata, _metadata_mtime, _feature_dtypes
     try:
         metadata_path = os.path.join(MODEL_FOLDER, 'model_metadata.json')
         if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                model_metadata.update(json.load(f))
+            mtime = os.path.getmtime(metadata_path)
+            with open(metadata_path, 'rb') as f:
+                model_metadata.update(orjson.loads(f.read()))
+            _metadata_mtime = mtime
+            _feature_dtypes = {feature: pl.Float32 for feature in model_metadata["features"]}
     except Exception as e:
         print(f"Error loading model metadata: {e}")
 
+def get_metadata():
+    """Get model metadata, re-reading the file only when it has changed"""
+    try:
+        mtime = os.path.getmtime(os.path.join(MODEL_FOLDER, 'model_metadata.json'))
+    except OSError:
+        return model_metadata
+    
+    if mtime != _metadata_mtime:
+        load_model_metadata()
+    return model_metadata
+
+def get_feature_dtypes():
+    """Get the parse schema for the model's feature columns (empty while no features are known)"""
+    get_metadata()
+    return _feature_dtypes
+
 def save_model_metadata():
     """Save model metadata to file"""
     try:
@@ -116,14 +429,21 @@ def initialize_app():
         # Create a mock model for demonstration
         print("No model found, creating mock model for testing...")
         if ml_model.load_model("mock"):
-            model_metadata.update({
+            mock_metadata = {
                 "model_type": "Random Forest (Mock)",
                 "accuracy": 0.85,
-                "last_trained": datetime.now().isoformat(),
+                "last_trained": datetime.fromtimestamp(
+                    os.path.getmtime(ml_model.model_path)
+                ).isoformat(),
                 "features": ["Feature1", "Feature2", "Feature3", "Feature4"],
                 "status": "Mock model loaded for testing"
-            })
-            save_model_metadata()
+            }
+            # Only rewrite the file when the mock was refitted: a new mtime makes every
+            # API worker reload the metadata, and each Celery child runs this on start
+            load_model_metadata()
+            if any(model_metadata.get(key) != value for key, value in mock_metadata.items()):
+                model_metadata.update(mock_metadata)
+                save_model_metadata()
             print("Mock model created successfully")
     
     load_model_metadata()
@@ -134,84 +454,356 @@ def initialize_app():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    metadata = get_metadata()
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "message": "ML Workshop Backend is running",
-        "model_status": model_metadata["status"]
+        "model_status": metadata["status"]
     })
 
 @app.route('/api/model-info', methods=['GET'])
 def get_model_info():
     """Get information about the current model"""
+    metadata = get_metadata()
     return jsonify({
         "success": True,
-        "model_type": model_metadata["model_type"],
-        "accuracy": model_metadata["accuracy"],
-        "last_trained": model_metadata["last_trained"],
-        "features": model_metadata["features"],
-        "status": model_metadata["status"]
+        "model_type": metadata["model_type"],
+        "accuracy": metadata["accuracy"],
+        "last_trained": metadata["last_trained"],
+        "features": metadata["features"],
+        "status": metadata["status"]
     })
 
+def get_uploaded_csv():
+    """Validate the uploaded CSV; returns (file, error_response)"""
+    if 'file' not in request.files:
+        return None, (jsonify({"success": False, "error": "No file uploaded"}), 400)
+    
+    file = request.files['file']
+    if file.filename == '':
+        return None, (jsonify({"success": False, "error": "No file selected"}), 400)
+    
+    if not file.filename.lower().endswith('.csv'):
+        return None, (jsonify({"success": False, "error": "File must be CSV format"}), 400)
+    
+    return file, None
+
+def save_upload(file):
+    """Save an uploaded file to the upload folder and return its path"""
+    filename = f"upload_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.csv"
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    uring_io.write_stream(filepath, file.stream)
+    return filepath
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
-    """Make predictions on uploaded CSV data"""
+    """Queue predictions on uploaded CSV data"""
+    try:
+        file, error = get_uploaded_csv()
+        if error:
+            return error
+        
+        filepath = save_upload(file)
+        
+        try:
+            task = run_prediction.delay(filepath)
+        except Exception as e:
+            # No task will ever read (and delete) the upload, so remove it here
+            if not KEEP_UPLOADS:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(filepath)
+            print(f"Error queueing prediction task: {e}")
+            return jsonify({"success": False, "error": "Prediction queue is unavailable, please try again later"}), 503
+        print(f"Queued prediction task {task.id} for {filepath}")
+        
+        return jsonify({"success": True, "task_id": task.id, "status": "queued"}), 202
+        
+    except Exception as e:
+        print(f"Error in predict endpoint: {e}")
+        return jsonify({"success": False, "error": f"Server error: {str(e)}"}), 500
+
+@app.route('/api/predict/stream', methods=['POST'])
+def predict_stream():
+    """Stream predictions as NDJSON, one line per prediction"""
     try:
-        if 'file' not in request.files:
-            return jsonify({"success": False, "error": "No file uploaded"}), 400
+        file, error = get_uploaded_csv()
+        if error:
+            return error
         
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"success": False, "error": "No file selected"}), 400
+        # Small uploads are parsed from memory instead of being written to disk and read back.
+        # Larger ones are copied to disk in bounded chunks and scanned from there, so memory
+        # stays at one CSV batch whatever the upload size. Either way the upload is consumed
+        # here because its stream is closed once this view returns
+        size = file.stream.seek(0, os.SEEK_END)
+        file.stream.seek(0)
+        if KEEP_UPLOADS or size > STREAM_MEMORY_LIMIT:
+            source = save_upload(file)
+        else:
+            source = file.read()
         
-        if not file.filename.lower().endswith('.csv'):
-            return jsonify({"success": False, "error": "File must be CSV format"}), 400
+        def generate():
+            try:
+                # Each batch's lines go out as one write, so the first rows reach the client
+                # as soon as the first batch is predicted and only one batch is held in memory
+                for results in iter_predictions(source):
+                    yield ndjson_lines(results)
+            except PredictionError as e:
+                yield dumps_json({"success": False, "error": e.message}) + b"\n"
+            finally:
+                if isinstance(source, str) and not KEEP_UPLOADS:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(source)
         
-        filename = f"upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
         
+    except Exception as e:
+        print(f"Error in predict stream endpoint: {e}")
+        return jsonify({"success": False, "error": f"Server error: {str(e)}"}), 500
+
+@app.route('/api/predict/rows', methods=['POST'])
+def predict_rows():
+    """Predict a few rows sent as JSON ({"rows": [[...], ...]}), batched with concurrent requests"""
+    try:
+        payload = request.get_json(silent=True) or {}
         try:
-            df = pd.read_csv(filepath)
-            if df.empty:
-                return jsonify({"success": False, "error": "CSV file is empty"}), 400
-            print(f"Successfully loaded CSV with {len(df)} rows and {len(df.columns)} columns")
-        except Exception as e:
-            return jsonify({"success": False, "error": f"Error reading CSV: {str(e)}"}), 400
+            with np.errstate(over='ignore'):  # out-of-range values are rejected below
+                rows = np.asarray(payload.get("rows"), dtype=np.float32)
+        except (TypeError, ValueError):
+            rows = None
         
-        predictions, confidence = ml_model.predict(df)
+        if rows is None or rows.ndim != 2 or len(rows) == 0:
+            return jsonify({"success": False, "error": "Request body must contain a non-empty 2-D 'rows' array"}), 400
         
-        if predictions is None:
-            return jsonify({"success": False, "error": "Model prediction failed"}), 500
+        n_features = getattr(ml_model.model, 'n_features_in_', None)
+        if n_features is not None and rows.shape[1] != n_features:
+            return jsonify({"success": False, "error": f"Each row must have {n_features} features"}), 400
         
-        results = format_predictions(df, predictions, confidence)
+        # Values beyond float32's range become inf; reject them here rather than in the shared batch
+        if not np.isfinite(rows).all():
+            return jsonify({"success": False, "error": "Rows must contain only finite numbers"}), 400
         
-        print(f"Successfully generated predictions for {len(results)} samples")
+        predictions, confidence = batcher.submit(rows).result(timeout=BATCH_RESULT_TIMEOUT)
+        results = format_predictions(None, predictions, confidence)
+        return jsonify({"success": True, "predictions": results})
         
-        return jsonify({
-            "success": True,
-            "predictions": results,
-            "summary": {
-                "total_samples": len(df),
-                "model_used": model_metadata["model_type"],
-                "accuracy": model_metadata["accuracy"]
-            }
-        })
+    except PredictionError as e:
+        return jsonify({"success": False, "error": e.message}), e.status_code
+    except FutureTimeoutError:
+        return jsonify({"success": False, "error": "Prediction timed out"}), 503
+    except Exception as e:
+        print(f"Error in predict rows endpoint: {e}")
+        return jsonify({"success": False, "error": f"Server error: {str(e)}"}), 500
+
+@app.route('/api/predict/<task_id>', methods=['GET'])
+def get_prediction(task_id):
+    """Poll the state of a queued prediction task"""
+    try:
+        result = AsyncResult(task_id, app=celery)
+        
+        if result.state == 'FAILURE':
+            error = str(result.result)
+            result.forget()
+            return jsonify({
+                "success": False,
+                "task_id": task_id,
+                "state": 'FAILURE',
+                "error": f"Prediction task failed: {error}"
+            }), 500
+        
+        if not result.ready():
+            return jsonify({"success": True, "task_id": task_id, "state": result.state}), 202
+        
+        # The worker already serialized the response; drop it from the result backend once
+        # read so full prediction arrays do not wait in Redis for result_expires
+        body, status_code = result.get()
+        result.forget()
+        return Response(body, status=status_code, mimetype='application/json')
         
     except Exception as e:
-        print(f"Error in predict endpoint: {e}")
+        print(f"Error in prediction status endpoint: {e}")
+        return jsonify({"success": False, "error": f"Server error: {str(e)}"}), 500
+
+@celery.task(name='app.run_prediction', bind=True)
+def run_prediction(self, filepath):
+    """Run the model on a saved CSV upload; returns (response_json, status_code)"""
+    response, status_code = predict_upload(filepath)
+    response.update({"task_id": self.request.id, "state": 'SUCCESS'})
+    # Returned as a JSON string so the result travels through the JSON result serializer
+    return dumps_json(response).decode(), status_code
+
+def predict_upload(filepath):
+    """Run the model on a saved CSV upload; returns (response, status_code)"""
+    try:
+        if not os.path.exists(filepath):
+            raise PredictionError(f"Upload {filepath} not found - prediction workers must share the API's uploads folder", 500)
+        results = merge_predictions(list(iter_predictions(filepath)))
+    except PredictionError as e:
+        return {"success": False, "error": e.message}, e.status_code
+    finally:
+        # A worker without access to the API's upload folder never sees the file
+        if not KEEP_UPLOADS:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(filepath)
+    
+    total_samples = len(results["id"])
+    print(f"Successfully generated predictions for {total_samples} samples")
+    
+    metadata = get_metadata()
+    return {
+        "success": True,
+        "predictions": results,
+        "summary": {
+            "total_samples": total_samples,
+            "model_used": metadata["model_type"],
+            "accuracy": metadata["accuracy"]
+        }
+    }, 200
+
+@worker_process_init.connect
+def init_worker(**kwargs):
+    """Load the model once in every Celery worker process"""
+    initialize_app()
+
+class PredictionError(Exception):
+    """Raised when an uploaded CSV cannot be turned into predictions"""
+    
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def iter_predictions(source):
+    """Parse a CSV (path or raw bytes) in batches and yield formatted predictions for each batch"""
+    next_id = 1
+    try:
+        # Polars parses on all cores; model features are parsed straight to float32
+        feature_dtypes = get_feature_dtypes()
+        csv = pl.scan_csv(source, schema_overrides=feature_dtypes)
+        
+        # Only parse the model's feature columns, in model order, when the file has all of them;
+        # otherwise fall back to every numeric column
+        if feature_dtypes and set(feature_dtypes) <= set(csv.collect_schema().names()):
+            csv = csv.select(list(feature_dtypes))
+        
+        batches = csv.collect_batches(chunk_size=CSV_CHUNK_SIZE, engine='streaming')
+        for batch in batches:
+            if batch.height == 0:
+                continue
+            
+            features = batch.select(cs.numeric().cast(pl.Float32)).to_numpy()
+            check_feature_count(features)
+            predictions, confidence = ml_model.predict(features)
+            
+            if predictions is None:
+                raise PredictionError("Model prediction failed", 500)
+            
+            yield format_predictions(batch, predictions, confidence, start_id=next_id)
+            next_id += batch.height
+    except PredictionError:
+        raise
+    except Exception as e:
+        raise PredictionError(f"Error reading CSV: {str(e)}", 400)
+    
+    if next_id == 1:
+        raise PredictionError("CSV file is empty", 400)
+
+def check_feature_count(features):
+    """Raise a PredictionError naming the expected columns when the CSV has the wrong number of them"""
+    n_features = getattr(ml_model.model, 'n_features_in_', None)
+    if n_features is None or features.shape[1] == n_features:
+        return
+    
+    names = get_metadata()["features"]
+    expected = f" ({', '.join(names)})" if len(names) == n_features else ""
+    raise PredictionError(
+        f"CSV must have {n_features} numeric feature columns{expected}, found {features.shape[1]}", 400
+    )
+
+def format_predictions(df, predictions, confidence, start_id=1):
+    """Format predictions as parallel columns for the JSON response"""
+    predictions = np.asarray(predictions)
+    return {
+        "id": np.arange(start_id, start_id + len(predictions), dtype=np.int32),
+        "prediction": predictions.astype(str) if predictions.dtype.kind in 'OS' else predictions,
+        "confidence": np.asarray(confidence, dtype=np.float32) if confidence is not None else None
+    }
+
+def ndjson_lines(results):
+    """Serialize format_predictions columns as one {"id", "prediction", "confidence"} line per row"""
+    ids = results["id"].tolist()
+    predictions = results["prediction"].tolist()
+    # Confidences stay float32 scalars so they print as in the column-wise responses
+    confidence = results["confidence"]
+    if confidence is None:
+        confidence = [None] * len(ids)
+    return b"".join(
+        dumps_json({"id": i, "prediction": p, "confidence": c}) + b"\n"
+        for i, p, c in zip(ids, predictions, confidence)
+    )
+
+def merge_predictions(parts):
+    """Concatenate the per-batch columns returned by format_predictions"""
+    return {
+        key: None if parts[0][key] is None else np.concatenate([part[key] for part in parts])
+        for key in parts[0]
+    }
+
+@app.route('/api/_profile', methods=['GET'])
+def profile_predictions():
+    """Profile the prediction pipeline on a canned CSV and return the top functions"""
+    if not ENABLE_PROFILING:
+        return jsonify({"success": False, "error": "Profiling is disabled, set ENABLE_PROFILING=1"}), 404
+    
+    try:
+        rows = request.args.get('rows', 100_000, type=int)
+        if not 1 <= rows <= PROFILE_MAX_ROWS:
+            return jsonify({"success": False, "error": f"rows must be between 1 and {PROFILE_MAX_ROWS}"}), 400
+        
+        os.makedirs(PROFILE_FOLDER, exist_ok=True)
+        csv_path = write_profile_csv(rows)
+        
+        profiler = cProfile.Profile()
+        profiler.runcall(lambda: merge_predictions(list(iter_predictions(csv_path))))
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        profile_path = os.path.join(PROFILE_FOLDER, f"bench_predict_{timestamp}.prof")
+        profiler.dump_stats(profile_path)
+        
+        # Record the types numba inferred for the forest kernel (expect uint8/uint16 inputs)
+        with open(os.path.join(PROFILE_FOLDER, 'numba_types.txt'), 'w') as f:
+            random_forest_numba._score.inspect_types(file=f)
+        
+        stats = pstats.Stats(profiler).sort_stats('cumulative')
+        top = []
+        for func in stats.fcn_list[:20]:
+            _, n_calls, total_time, cumulative_time, _ = stats.stats[func]
+            top.append({
+                "function": pstats.func_std_string(func),
+                "calls": n_calls,
+                "total_time": total_time,
+                "cumulative_time": cumulative_time
+            })
+        
+        return jsonify({"success": True, "rows": rows, "profile_file": profile_path, "top_functions": top})
+        
+    except PredictionError as e:
+        return jsonify({"success": False, "error": e.message}), e.status_code
+    except Exception as e:
+        print(f"Error in profile endpoint: {e}")
         return jsonify({"success": False, "error": f"Server error: {str(e)}"}), 500
 
-def format_predictions(df, predictions, confidence):
-    """Format predictions for JSON response"""
-    results = []
-    for i, (pred, conf) in enumerate(zip(predictions, confidence)):
-        results.append({
-            "id": i + 1,
-            "prediction": str(pred),
-            "confidence": float(conf) if conf is not None else None
-        })
-    return results
+def write_profile_csv(rows):
+    """Write (once per size) a random CSV with the model's feature columns for profiling"""
+    csv_path = os.path.join(PROFILE_FOLDER, f"bench_input_{rows}.csv")
+    if not os.path.exists(csv_path):
+        features = get_metadata()["features"] or [
+            f"feature{i + 1}" for i in range(getattr(ml_model.model, 'n_features_in_', 4))
+        ]
+        rng = np.random.default_rng(42)
+        data = rng.standard_normal((rows, len(features)), dtype=np.float32)
+        pl.DataFrame(data, schema=features).write_csv(csv_path)
+    return csv_path
 
 @app.route('/api/upload-model', methods=['POST'])
 def upload_model():
@@ -231,19 +823,29 @@ def index():
             "health": "/api/health",
             "model_info": "/api/model-info", 
             "predict": "/api/predict",
+            "predict_stream": "/api/predict/stream",
+            "predict_rows": "/api/predict/rows",
+            "prediction_status": "/api/predict/<task_id>",
             "upload_model": "/api/upload-model"
         },
         "status": "running"
     })
 
+# Under gunicorn --preload, initialize once at import in the master process so the
+# model is loaded a single time and shared copy-on-write with the forked workers
+if os.environ.get('GUNICORN_PRELOAD') == '1' and __name__ != '__main__':
+    initialize_app()
+
 # --- MAIN EXECUTION ---
 
 if __name__ == '__main__':
+    # Local development only - in production run `gunicorn -c gunicorn.conf.py wsgi:application`
     initialize_app()  # Initialize once here before starting the server
     print("=" * 50)
     print("Starting ML Workshop Backend Server...")
     print("API will be available at: http://localhost:5000")
     print("Health check: http://localhost:5000/api/health")
     print("Model info: http://localhost:5000/api/model-info")
+    print(f"Predictions are queued - start a worker with: celery -A app:celery worker -Q {CLASSIFICATION_QUEUE}")
     print("=" * 50)
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,26 @@
+import importlib.util
+import multiprocessing
+import os
+
+# Threaded workers keep serving health/model-info/polling requests while others wait on I/O;
+# predictions themselves run on the Celery workers
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2 * multiprocessing.cpu_count() + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Load the app and model once in the master; workers share the read-only trees copy-on-write.
+# app.py reads GUNICORN_PRELOAD to initialize itself at import time.
+# sklearnex starts oneDAL's TBB thread pool when a model is loaded or fitted, and that pool
+# does not survive fork(), so with sklearnex active each worker loads the model after forking
+sklearnex_active = (os.environ.get('USE_SKLEARNEX', '1') == '1'
+                    and importlib.util.find_spec('sklearnex') is not None)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0' if sklearnex_active else '1') == '1'
+os.environ['GUNICORN_PRELOAD'] = '1' if preload_app else '0'
+
+
+def post_fork(server, worker):
+    """Initialize the app in every worker process when it was not preloaded"""
+    if not preload_app:
+        from app import initialize_app
+        initialize_app()
@@ -0,0 +1,119 @@
+import numpy as np
+from scipy import sparse
+# Imported from the private module on purpose: sklearnex's patch_sklearn() swaps the classes
+# exported by sklearn.ensemble, but leaves these stock ones that model.pkl files unpickle to
+# (the patched classes subclass them, so they still match)
+from sklearn.ensemble._forest import (
+    ExtraTreesClassifier,
+    ExtraTreesRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+
+FOREST_TYPES = (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor)
+
+GEMM_MEMORY_BUDGET = 256 << 20  # bytes of dense intermediates per block of rows
+GEMM_BYTES_PER_NODE = 12  # per row and node: float32 product, bool comparison, float32 cast
+GEMM_MAX_BLOCK_SIZE = 4096
+GEMM_MIN_BLOCK_SIZE = 64  # below this the products cost more than tree traversal saves
+
+
+def gemm_block_size(n_nodes):
+    """Rows per product that keep the (rows x nodes) intermediates within GEMM_MEMORY_BUDGET"""
+    return min(GEMM_MAX_BLOCK_SIZE, GEMM_MEMORY_BUDGET // (GEMM_BYTES_PER_NODE * max(n_nodes, 1)))
+
+
+class ForestGEMM:
+    """Random forest inference as a chain of sparse matrix products.
+
+    Every tree is flattened into the matrices used by the GEMM strategy of
+    "Taming Model Serving Complexity" (Hummingbird), stacked over all trees:
+
+    - A (features x internal nodes): one-hot of the feature each node tests
+    - B (internal nodes): split thresholds
+    - C (internal nodes x leaves): +1 if the leaf is in the node's left subtree,
+      -1 if it is in the right subtree
+    - D (leaves): number of left turns on the path from the root to the leaf
+    - E (leaves x outputs): leaf values, averaged over the trees
+
+    so that ``scores = (((X @ A) <= B) @ C == D) @ E``.
+    """
+
+    def __init__(self, forest):
+        self.is_classifier = hasattr(forest, 'classes_')
+        n_trees = len(forest.estimators_)
+
+        a_rows, a_cols, thresholds = [], [], []
+        c_rows, c_cols, c_vals = [], [], []
+        left_turns, leaf_values = [], []
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            node_offset, leaf_offset = len(thresholds), len(left_turns)
+            internal_index, leaf_index = {}, {}
+            for node in range(tree.node_count):
+                if tree.children_left[node] == -1:
+                    leaf_index[node] = leaf_offset + len(leaf_index)
+                else:
+                    internal_index[node] = node_offset + len(internal_index)
+                    a_rows.append(tree.feature[node])
+                    a_cols.append(internal_index[node])
+                    thresholds.append(tree.threshold[node])
+
+            for node in sorted(leaf_index, key=leaf_index.get):
+                left_turns.append(0)
+                value = tree.value[node, 0]
+                leaf_values.append(value / value.sum() if self.is_classifier else value)
+
+            # Walk every root-to-leaf path, recording which way each split went
+            stack = [(0, [])]
+            while stack:
+                node, path = stack.pop()
+                if node in leaf_index:
+                    leaf = leaf_index[node]
+                    for split, went_left in path:
+                        c_rows.append(split)
+                        c_cols.append(leaf)
+                        c_vals.append(1.0 if went_left else -1.0)
+                        left_turns[leaf] += went_left
+                    continue
+                split = internal_index[node]
+                stack.append((tree.children_left[node], path + [(split, True)]))
+                stack.append((tree.children_right[node], path + [(split, False)]))
+
+        n_internal, n_leaves = len(thresholds), len(left_turns)
+        self.block_size = gemm_block_size(n_internal + n_leaves)  # rows per product
+        self.A = sparse.csr_matrix(
+            (np.ones(n_internal, dtype=np.float32), (a_rows, a_cols)),
+            shape=(forest.n_features_in_, n_internal)
+        )
+        self.B = np.asarray(thresholds, dtype=np.float64)
+        self.C = sparse.csr_matrix(
+            (np.asarray(c_vals, dtype=np.float32), (c_rows, c_cols)),
+            shape=(n_internal, n_leaves)
+        )
+        self.D = np.asarray(left_turns, dtype=np.float32)
+        self.E = sparse.csr_matrix(np.asarray(leaf_values, dtype=np.float64) / n_trees)
+
+    @staticmethod
+    def supports(model):
+        """Whether the model is a single-output forest small enough to convert.
+
+        Every block of rows expands to dense (rows x nodes) matrices, so forests too large
+        to fit GEMM_MIN_BLOCK_SIZE rows in the memory budget are left to tree traversal.
+        """
+        if not isinstance(model, FOREST_TYPES) or model.n_outputs_ != 1:
+            return False
+        n_nodes = sum(estimator.tree_.node_count for estimator in model.estimators_)
+        return gemm_block_size(n_nodes) >= GEMM_MIN_BLOCK_SIZE
+
+    def predict_scores(self, X):
+        """Class probabilities (classifiers) or predicted values (regressors), one row per sample"""
+        X = np.asarray(X, dtype=np.float32)
+        scores = np.empty((X.shape[0], self.E.shape[1]), dtype=np.float64)
+        for start in range(0, X.shape[0], self.block_size):
+            block = X[start:start + self.block_size]
+            # X is float32 like in scikit-learn; compared to the float64 thresholds exactly
+            decisions = ((block @ self.A) <= self.B).astype(np.float32)
+            leaves = ((decisions @ self.C) == self.D).astype(np.float32)
+            scores[start:start + len(block)] = leaves @ self.E
+        return scores
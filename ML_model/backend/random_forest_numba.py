@@ -0,0 +1,126 @@
+import threading
+
+import numba
+import numpy as np
+from numba import njit, prange, types
+
+from random_forest_gemm import FOREST_TYPES
+
+
+ROW_BLOCK = 256  # rows pushed through one tree at a time, keeps the tree's nodes in cache
+
+# numba's default workqueue threading layer aborts the process when parallel kernels are
+# entered from several threads at once (request threads, the batcher), so calls into
+# _score are serialized; each call already spreads its rows over all numba threads
+_score_lock = threading.Lock()
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _score(X, roots, feature, threshold, left, right, value):
+    """Sum the leaf values reached by every row in every tree (row blocks run in parallel)"""
+    n_rows, n_outputs = X.shape[0], value.shape[1]
+    scores = np.zeros((n_rows, n_outputs))
+    for block in prange((n_rows + ROW_BLOCK - 1) // ROW_BLOCK):
+        start = block * ROW_BLOCK
+        stop = min(start + ROW_BLOCK, n_rows)
+        for root in roots:
+            for i in range(start, stop):
+                node = root
+                while left[node] != -1:
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                for k in range(n_outputs):
+                    scores[i, k] += value[node, k]
+    return scores
+
+
+class ForestKernel:
+    """Random forest flattened into node arrays and evaluated by a numba-compiled traversal"""
+
+    def __init__(self, forest):
+        self.is_classifier = hasattr(forest, 'classes_')
+        self.n_features = forest.n_features_in_
+        n_trees = len(forest.estimators_)
+
+        roots, features, thresholds, lefts, rights, values = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            value = tree.value[:, 0, :]
+            if self.is_classifier:
+                value = value / value.sum(axis=1, keepdims=True)
+
+            roots.append(offset)
+            features.append(tree.feature)
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+            rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+            values.append(value / n_trees)
+            offset += tree.node_count
+
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.feature = np.concatenate(features).astype(np.int32)
+        self.threshold = np.concatenate(thresholds).astype(np.float64)
+        self.left = np.concatenate(lefts).astype(np.int32)
+        self.right = np.concatenate(rights).astype(np.int32)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+
+        # Bin each feature by the thresholds the forest splits it on: x <= thresholds[k]
+        # exactly when bin(x) <= k, so rows are compared as small unsigned ints
+        internal = self.left != -1
+        self.bin_thresholds = [
+            np.unique(self.threshold[internal & (self.feature == f)])
+            for f in range(self.n_features)
+        ]
+        self.bin_dtype = np.min_scalar_type(max(len(t) for t in self.bin_thresholds))
+        self.node_bin = np.zeros(len(self.feature), dtype=self.bin_dtype)
+        for f, thresholds in enumerate(self.bin_thresholds):
+            nodes = internal & (self.feature == f)
+            self.node_bin[nodes] = np.searchsorted(thresholds, self.threshold[nodes])
+
+    @staticmethod
+    def supports(model):
+        """Whether the model is a single-output forest that can be flattened"""
+        return isinstance(model, FOREST_TYPES) and model.n_outputs_ == 1
+
+    @staticmethod
+    def is_worthwhile():
+        """The kernel wins through threads; on a single thread scikit-learn's traversal is faster"""
+        return numba.get_num_threads() > 1
+
+    def bin(self, X):
+        """Map feature values to their bin among the forest's split thresholds"""
+        X_binned = np.empty(X.shape, dtype=self.bin_dtype)
+        for f, thresholds in enumerate(self.bin_thresholds):
+            X_binned[:, f] = np.searchsorted(thresholds, X[:, f])
+        return X_binned
+
+    def predict_scores(self, X):
+        """Class probabilities (classifiers) or predicted values (regressors), one row per sample"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X has shape {X.shape}, but the forest expects {self.n_features} features")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity")
+        X_binned = self.bin(X)
+        with _score_lock:
+            return _score(X_binned, self.roots, self.feature, self.node_bin, self.left, self.right, self.value)
+
+
+def _warm_up():
+    """Compile the kernel at import so JIT time is not paid by the first request.
+
+    Compiling by signature (rather than calling the kernel) does not start numba's
+    thread pool, so the module can be imported before a fork, e.g. by gunicorn --preload.
+    """
+    for bin_type in (types.uint8, types.uint16):
+        _score.compile((
+            bin_type[:, ::1], types.int32[::1], types.int32[::1], bin_type[::1],
+            types.int32[::1], types.int32[::1], types.float64[:, ::1]
+        ))
+
+
+_warm_up()
@@ -0,0 +1,95 @@
+import itertools
+import os
+import platform
+import shutil
+
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+URING_CHUNK_SIZE = 1 << 20  # bytes per write submission entry
+URING_QUEUE_DEPTH = 32  # entries submitted with a single syscall
+
+
+def _probe():
+    """Whether an io_uring instance can be set up (Linux with io_uring enabled)"""
+    if liburing is None or platform.system() != 'Linux':
+        return False
+
+    ring = liburing.Ring()
+    try:
+        liburing.io_uring_queue_init(1, ring)
+    except Exception:
+        return False
+    liburing.io_uring_queue_exit(ring)
+    return True
+
+
+URING_AVAILABLE = _probe()
+
+
+def write_stream(path, stream):
+    """Copy a binary stream to a file in URING_CHUNK_SIZE pieces, writing through io_uring when available"""
+    first = stream.read(URING_CHUNK_SIZE)
+    if not URING_AVAILABLE or len(first) < URING_CHUNK_SIZE:
+        with open(path, 'wb') as f:
+            f.write(first)
+            shutil.copyfileobj(stream, f, URING_CHUNK_SIZE)
+        return
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _uring_write(fd, first, stream)
+    finally:
+        os.close(fd)
+
+
+def _read_chunks(first, stream):
+    """Yield (offset, chunk) pairs for the first chunk and the rest of the stream"""
+    offset, chunk = 0, first
+    while chunk:
+        yield offset, chunk
+        offset += len(chunk)
+        chunk = stream.read(URING_CHUNK_SIZE)
+
+
+def _uring_write(fd, first, stream):
+    """Queue one write per chunk as it is read and reap a whole queue of completions per submit;
+    at most URING_QUEUE_DEPTH chunks are held in memory at a time"""
+    ring, cqe = liburing.Ring(), liburing.Cqe()
+    liburing.io_uring_queue_init(URING_QUEUE_DEPTH, ring)
+    try:
+        chunks = _read_chunks(first, stream)
+        while True:
+            group = list(itertools.islice(chunks, URING_QUEUE_DEPTH))
+            if not group:
+                break
+            for index, (offset, chunk) in enumerate(group):
+                sqe = liburing.io_uring_get_sqe(ring)
+                liburing.io_uring_prep_write(sqe, fd, chunk, offset)
+                liburing.io_uring_sqe_set_data64(sqe, index)
+            liburing.io_uring_submit_and_wait(ring, len(group))
+
+            reaped = 0
+            while reaped < len(group):
+                liburing.io_uring_wait_cqe(ring, cqe)
+                ready = liburing.io_uring_cq_ready(ring)
+                for i in range(ready):
+                    entry = cqe[i]
+                    offset, chunk = group[entry.user_data]
+                    if entry.res < 0:
+                        raise OSError(-entry.res, os.strerror(-entry.res))
+                    if entry.res < len(chunk):  # short write, finish it synchronously
+                        _write_all(fd, chunk[entry.res:], offset + entry.res)
+                liburing.io_uring_cq_advance(ring, ready)
+                reaped += ready
+    finally:
+        liburing.io_uring_queue_exit(ring)
+
+
+def _write_all(fd, data, offset):
+    """pwrite until all of data is written"""
+    while data:
+        written = os.pwrite(fd, data, offset)
+        data, offset = data[written:], offset + written
@@ -135,7 +135,11 @@ async function handlePrediction() {
             body: formData
         });
         
-        const data = await response.json();
+        let data = await response.json();
+        
+        if (data.success && data.task_id) {
+            data = await pollPrediction(data.task_id);
+        }
         
         if (data.success) {
             displayResults(data);
@@ -149,6 +153,28 @@ async function handlePrediction() {
     }
 }
 
+// Predictions run as background tasks - poll until the task has finished
+const POLL_INTERVAL_MS = 1000;
+const MAX_POLL_ATTEMPTS = 300;  // give up after ~5 minutes
+
+async function pollPrediction(taskId) {
+    for (let attempt = 0; attempt < MAX_POLL_ATTEMPTS; attempt++) {
+        const response = await fetch(`${API_BASE_URL}/predict/${taskId}`);
+        const data = await response.json();
+        
+        if (response.status !== 202) {
+            return data;
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+    }
+    
+    return {
+        success: false,
+        error: 'Prediction timed out. Please check that a prediction worker is running.'
+    };
+}
+
 function displayResults(data) {
     let html = '<div class="status success">Prediction completed successfully!</div>';
     
@@ -160,23 +186,28 @@ function displayResults(data) {
         html += `<p>Accuracy: ${(data.summary.accuracy * 100).toFixed(2)}%</p>`;
     }
     
-    if (data.predictions && data.predictions.length > 0) {
+    // Predictions arrive as parallel columns: { id: [...], prediction: [...], confidence: [...] }
+    const predictions = data.predictions;
+    const total = predictions ? predictions.id.length : 0;
+    
+    if (total > 0) {
         html += `<h3>Sample Predictions (first 10 rows)</h3>`;
         html += `<div style="overflow-x: auto;"><table>`;
         html += `<tr><th>ID</th><th>Prediction</th><th>Confidence</th></tr>`;
         
-        data.predictions.slice(0, 10).forEach(pred => {
+        for (let i = 0; i < Math.min(total, 10); i++) {
+            const confidence = predictions.confidence ? predictions.confidence[i] : null;
             html += `<tr>
-                <td>${pred.id}</td>
-                <td>${pred.prediction}</td>
-                <td>${pred.confidence ? (pred.confidence * 100).toFixed(2) + '%' : 'N/A'}</td>
+                <td>${predictions.id[i]}</td>
+                <td>${predictions.prediction[i]}</td>
+                <td>${confidence ? (confidence * 100).toFixed(2) + '%' : 'N/A'}</td>
             </tr>`;
-        });
+        }
         
         html += `</table></div>`;
         
-        if (data.predictions.length > 10) {
-            html += `<p>... and ${data.predictions.length - 10} more predictions</p>`;
+        if (total > 10) {
+            html += `<p>... and ${total - 10} more predictions</p>`;
         }
     }
     